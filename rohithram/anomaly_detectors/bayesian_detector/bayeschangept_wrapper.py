@@ -17,10 +17,14 @@ from anomaly_detectors.utils.error_codes import error_codes
 from anomaly_detectors.utils import type_checker as type_checker
 from anomaly_detectors.utils import csv_prep_for_reader as csv_helper
 from anomaly_detectors.utils import make_ackg_json
+from anomaly_detectors.utils.detection_result import Detection_result
 from anomaly_detectors.bayesian_detector import bayesian_changept_detector
+from anomaly_detectors.bayesian_detector import execution_planner
 
 import json
 import traceback
+import multiprocessing
+import collections
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -34,10 +38,43 @@ algo_params_type ={
             'pthres':float or int,
             'Nw':int,
             'mean_runlen':int,
-            'to_plot':bool
+            'to_plot':bool,
+            'mode':str
         }
+'''
+ideal argument types for execution planner
+'''
+planner_params_type ={
+            'mem_budget_mb':int,
+            'time_budget':float or int,
+            'max_workers':int
+        }
+
+def detect_job(data,assetno,algo_kwargs,plan):
+        '''
+        Runs anomaly detection for one (asset, metric) job with the strategy chosen by the execution planner
+        and returns its Detection_result, it is module level so that it can run in worker processes.
+        Errors are caught per job so that one bad series doesn't lose the results of all the others, the job then
+        gives a Detection_result with no anomalies and the error message
+        '''
+        anomaly_detector = bayesian_changept_detector.Bayesian_Changept_Detector(data,assetno=assetno,
+                                                                                 strategy=plan['strategy'],
+                                                                                 max_runlen=plan['max_runlen'],
+                                                                                 chunk_len=plan['chunk_len'],
+                                                                                 decimation=plan['decimation'],
+                                                                                 **algo_kwargs)
+        try:
+            return anomaly_detector.detect()
+        except Exception as e:
+            traceback.print_exc()
+            print("\nAnomaly detection failed for AssetNo : {} ,Metric : {}\n".format(assetno,
+                                                                                     anomaly_detector.metric_name))
+            return Detection_result(assetno=assetno,metric_name=anomaly_detector.metric_name,anom_timestamps=[],
+                                    anom_scores=[],algo_code=anomaly_detector.algo_code,
+                                    algo_type=anomaly_detector.algo_type,n_points=len(data),error=str(e))
 
-def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_plot=True):
+def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_plot=True,mode='online',
+         mem_budget_mb=None,time_budget=None,max_workers=1):
 
         '''
         Wrapper function which should be called inorder to run the anomaly detection, it has four parts :
@@ -47,8 +84,12 @@ def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_p
                             returns dictionary with error message
         *preprocessor     - preprocessors are defined in preprocessors.py, which takes in data and gives out processed 
                             data
+        *planner          - Class Execution_planner defined in execution_planner.py, which estimates memory and time
+                            of each (asset, metric) job and picks its execution strategy and the no of jobs to run
+                            in parallel within the memory budget
         *anomaly detector - Class Bayesian_Changept_Detector defined in bayesian_changept_detector.py, which takes in
-                            data and algorithm parameters as argument and returns anomaly indexes and data.        
+                            data and algorithm parameters as argument and returns a Detection_result record with
+                            anomaly timestamps and scores.
         *make_ack_json    - Function to make acknowledge json
         
         
@@ -65,6 +106,19 @@ def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_p
             Default : 100
             to_plot : Boolean .Give True to see the plots of change-points detected and False if there is no need for plotting
             Default : True
+            mode : String, 'online' or 'offline'. Give 'offline' for batch backfills of complete historical series, it does
+            exact Bayesian segmentation of the whole series with pruning and ignores samples_to_wait
+            Default : 'online'
+            mem_budget_mb : Positive Integer, memory budget in MB for all the jobs running together. Series whose
+            run length probability matrix doesn't fit fall back to less memory hungry strategies instead of running
+            out of memory
+            Default : None (no limit)
+            time_budget : Positive Float or Integer, estimated time budget in seconds per job. Long series which don't fit the
+            memory budget keep exact changepoint scores, whose time grows with square of no of datapoints, unless this
+            is given
+            Default : None (no limit)
+            max_workers : Positive Integer, maximum no of jobs to run in parallel (only when to_plot is False)
+            Default : 1
         Note:
         To run this, import this python file as module and call this function with required args and it will detect
         anomalies and writes to the local database.
@@ -79,7 +133,8 @@ def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_p
             'pthres':thres_prob,
             'Nw':samples_to_wait,
             'mean_runlen':expected_run_length,
-            'to_plot':to_plot
+            'to_plot':to_plot,
+            'mode':mode
         }
               
         '''
@@ -98,6 +153,16 @@ def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_p
             if(res!=None):
                 return json.dumps(res)
             
+            planner_kwargs = {
+                'mem_budget_mb':mem_budget_mb,
+                'time_budget':time_budget,
+                'max_workers':max_workers
+            }
+            checker = type_checker.Type_checker(kwargs=planner_kwargs,ideal_args_type=planner_params_type)
+            res = checker.params_checker()
+            if(res!=None):
+                return json.dumps(res)
+            
             
             # instanstiating the reader class with reader arguments
             data_reader = Data_reader(filepath=filepath)
@@ -105,16 +170,19 @@ def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_p
             #otherwise gives string 'Empty Dataframe'
             entire_data = data_reader.read()
             writer_data = []
-            anomaly_detectors = []
+            detection_results = []
             
             if((len(entire_data)!=0 and entire_data!=None and type(entire_data)!=dict)):
 
                 '''
                 looping over the data per assets and inside that looping over metrics per asset
-                * Instantiates anomaly detector class with algo args and metric index to detect on
-                * Stores the anomaly indexes and anomaly detector object to bulk write to db at once
+                * Makes the list of (asset, metric) jobs and plans all of them before running any
+                * Instantiates anomaly detector class with algo args, metric index and planned strategy to detect on
+                * Stores only the compact detection result per metric to bulk write to db at once, the detector and
+                  the asset's dataframe are released as soon as the asset is done
                 '''
-
+                
+                jobs = []
                 for i,data_per_asset in enumerate(entire_data):
                     assetno = pd.unique(data_per_asset['assetno'])[0]
 
@@ -122,19 +190,54 @@ def main(filepath,thres_prob=0.5,samples_to_wait=10,expected_run_length=100,to_p
                     print("Overview of data : \n{}\n".format(data_per_asset.head()))
 
                     for data_col in range(1,len(data_per_asset.columns[1:])+1):
+                        jobs.append((i,assetno,data_col))
+                
+                planner = execution_planner.Execution_planner(mean_runlen=expected_run_length,Nw=samples_to_wait,
+                                                              mode=mode,to_plot=to_plot,**planner_kwargs)
+                plans,n_workers = planner.plan([len(entire_data[i]) for i,assetno,data_col in jobs])
+                planner.report(["AssetNo : {} ,Metric : {}".format(assetno,entire_data[i].columns[data_col])
+                                for i,assetno,data_col in jobs],plans,n_workers)
+                
+                if(n_workers==1):
+                    for job_no,((i,assetno,data_col),plan) in enumerate(zip(jobs,plans)):
                         algo_kwargs['data_col_index'] = data_col
                         print("\nAnomaly detection for AssetNo : {} ,Metric : {}\n ".format(
-                            assetno,data_per_asset.columns[data_col]))
+                            assetno,entire_data[i].columns[data_col]))
                         
-                        anomaly_detector = bayesian_changept_detector.Bayesian_Changept_Detector(data_per_asset,
-                                                                                                 assetno=assetno,
-                                                                                                 **algo_kwargs)
-                        data,anom_indexes = anomaly_detector.detect_anomalies()
-
-                        anomaly_detectors.append(anomaly_detector)
+                        detection_results.append(detect_job(entire_data[i],assetno,algo_kwargs,plan))
+                        
+                        if(job_no==len(jobs)-1 or jobs[job_no+1][0]!=i):
+                            entire_data[i] = None
+                else:
+                    # each worker only gets the assetno column and the metric it detects on, and no more than
+                    # n_workers jobs are submitted at a time so that only their copies of the data are held
+                    # (Pool.imap would pull all of them from a generator right away)
+                    algo_kwargs['data_col_index'] = 1
+                    pending = collections.deque()
+                    pool = multiprocessing.Pool(n_workers)
+                    try:
+                        for job_no,((i,assetno,data_col),plan) in enumerate(zip(jobs,plans)):
+                            if(len(pending)==n_workers):
+                                detection_results.append(pending.popleft().get())
+                            pending.append(pool.apply_async(detect_job,(entire_data[i].iloc[:,[0,data_col]],assetno,
+                                                                        algo_kwargs,plan)))
+                            
+                            if(job_no==len(jobs)-1 or jobs[job_no+1][0]!=i):
+                                entire_data[i] = None
+                        
+                        while(pending):
+                            detection_results.append(pending.popleft().get())
+                    except Exception:
+                        # outstanding jobs are of no use once the run has failed
+                        pool.terminate()
+                        raise
+                    else:
+                        pool.close()
+                    finally:
+                        pool.join()
                         
                 ack_json = {}
-                ack_json = make_ackg_json.make_ack_json(anomaly_detectors)
+                ack_json = make_ackg_json.make_ack_json(detection_results)
                         
                 return json.dumps(ack_json)
             elif(type(entire_data)==dict):
@@ -7,9 +7,12 @@ import matplotlib.pyplot as plt
 import bayesian_changepoint_detection.online_changepoint_detection as oncd
 from functools import partial
 import matplotlib.cm as cm
+from scipy.special import gammaln
+from anomaly_detectors.utils.detection_result import Detection_result
 
 class Bayesian_Changept_Detector():
-    def __init__(self,data,assetno,data_col_index=1,pthres=0.5,mean_runlen = 100,Nw=10,to_plot=True):
+    def __init__(self,data,assetno,data_col_index=1,pthres=0.5,mean_runlen = 100,Nw=10,to_plot=True,
+                 mode='online',prune_thres=1e-10,max_candidates=200,strategy='full',max_runlen=None,chunk_len=None,decimation=1):
         
         '''
         Class which is used to find Changepoints in the dataset with given algorithm parameters.
@@ -26,6 +29,22 @@ class Bayesian_Changept_Detector():
         Nw (samples to wait) -> (int) By default 10 is being used for optimal performance. It is the samples after which
                                 we start assigning probailities for it to be a changepoint.
         to_plot -> True if you want to plot anomalies
+        mode -> 'online' (default) for online run length filtering or 'offline' for exact batch segmentation of
+                the complete series, which doesn't need Nw and is suited for historical backfills
+        prune_thres -> (float) By default 1e-10, only used in offline mode. Candidate segment boundaries whose
+                       posterior weight falls below this are dropped
+        max_candidates -> (int) By default 200, only used in offline mode. At most these many most probable
+                          candidate segment starts are kept per datapoint, which keeps the recursions linear
+        strategy -> execution strategy of online mode, usually chosen by Execution_planner (execution_planner.py):
+                    'full' (default) keeps the whole run length probability matrix (n x n) as before,
+                    'scores_only' and 'truncated' only keep the changepoint probability of each datapoint,
+                    'segmented' does the same in chunks of chunk_len datapoints and picks anomalies per chunk,
+                    'decimated' runs on block means of decimation datapoints each and maps anomalies back
+                    Offline mode only makes use of 'decimated', any other strategy runs the offline segmentation
+        max_runlen -> (int) By default None, run lengths above this are dropped ('truncated', 'segmented' and
+                      'decimated' strategies)
+        chunk_len -> (int) By default None, no of datapoints per chunk for 'segmented' strategy
+        decimation -> (int) By default 1, no of datapoints averaged into one for 'decimated' strategy
         '''
         
         
@@ -40,6 +59,13 @@ class Bayesian_Changept_Detector():
         self.mean_runlen = mean_runlen
         self.Nw = Nw
         self.to_plot = to_plot
+        self.mode = mode
+        self.prune_thres = prune_thres
+        self.max_candidates = max_candidates
+        self.strategy = strategy
+        self.max_runlen = max_runlen
+        self.chunk_len = chunk_len
+        self.decimation = decimation
 
 
     def detect_anomalies(self):
@@ -53,13 +79,42 @@ class Bayesian_Changept_Detector():
 
         ncol = self.data_col_index
 
-        R,maxes = self.findonchangepoint(data[data.columns[ncol]].values)
-        anom_indexes = self.findanomindexes(R,maxes)
+        if(self.strategy=='decimated'):
+            anom_indexes = self.finddecimatedanomindexes()
+        elif(self.mode=='offline'):
+            cp_probs = self.findoffchangepoint(data[data.columns[ncol]].values)
+            anom_indexes = self.findoffanomindexes(cp_probs)
+        elif(self.strategy=='segmented'):
+            anom_indexes = self.findsegmentedanomindexes(data[data.columns[ncol]].values)
+        elif(self.strategy in ['scores_only','truncated']):
+            cp_row,state = self.findscorechangepoint(data[data.columns[ncol]].values,max_runlen=self.max_runlen)
+            anom_indexes = self.findscoreanomindexes(cp_row)
+        else:
+            R,maxes = self.findonchangepoint(data[data.columns[ncol]].values)
+            anom_indexes = self.findanomindexes(R,maxes)
         self.anom_indexes = anom_indexes
         print("\n No of Anomalies detected = %g"%(len(anom_indexes)))
 
         return data,anom_indexes
     
+
+    def detect(self):
+        
+        '''
+        Detects anomalies and returns a Detection_result with only the anomaly timestamps and scores, so
+        the detector, its data and the posterior can be released as soon as the series is done
+        '''
+        data,anom_indexes = self.detect_anomalies()
+        result = Detection_result(assetno=self.assetno,metric_name=self.metric_name,
+                                  anom_timestamps=data.index[np.asarray(anom_indexes,dtype=int)].values,
+                                  anom_scores=self.anom_scores,algo_code=self.algo_code,
+                                  algo_type=self.algo_type,n_points=len(data))
+        
+        # dropping the references to the asset's dataframe and the scores
+        self.data = None
+        self.anom_scores = None
+        return result
+    
     
     def findonchangepoint(self,data):
         '''
@@ -71,6 +126,121 @@ class Bayesian_Changept_Detector():
         return R,maxes
     
 
+    def findscorechangepoint(self,data,max_runlen=None,state=None):
+        '''
+        Same recursion as findonchangepoint, but keeps only the current run length distribution instead of the
+        whole matrix, so memory is linear in the no of datapoints. Run lengths above max_runlen are dropped when
+        given, which also bounds the time per datapoint.
+        state -> (run length distribution, observation likelihood) returned by the previous call, to carry on
+                 the recursion over consecutive chunks of a series
+        Returns -> cp_row, numpy array where cp_row[i] is R[Nw,i+1] of findonchangepoint, and the state
+        '''
+        Nw = self.Nw
+        if(state is None):
+            state = (np.array([1.0]),oncd.StudentT(0.1, .01, 1, 0))
+        run_probs,observation_likelihood = state
+        hazard = partial(oncd.constant_hazard,self.mean_runlen)
+        cp_row = np.zeros(len(data))
+
+        for t,x in enumerate(data):
+            predprobs = observation_likelihood.pdf(x)
+            H = hazard(np.array(range(len(run_probs))))
+            run_probs = np.append(np.sum(run_probs*predprobs*H),run_probs*predprobs*(1-H))
+            observation_likelihood.update_theta(x)
+
+            if(max_runlen is not None and len(run_probs)>max_runlen+1):
+                run_probs = run_probs[:max_runlen+1]
+                observation_likelihood.mu = observation_likelihood.mu[:max_runlen+1]
+                observation_likelihood.kappa = observation_likelihood.kappa[:max_runlen+1]
+                observation_likelihood.alpha = observation_likelihood.alpha[:max_runlen+1]
+                observation_likelihood.beta = observation_likelihood.beta[:max_runlen+1]
+
+            run_probs = run_probs/np.sum(run_probs)
+            if(Nw<len(run_probs)):
+                cp_row[t] = run_probs[Nw]
+
+        return cp_row,(run_probs,observation_likelihood)
+    
+
+    def findoffchangepoint(self,data):
+        '''
+        Offline (batch) changepoint detection on the complete series using Fearnhead's exact segmentation
+        recursions with pruning. The same Normal-Gamma model as the online detector is used for the segments
+        and the gap between changepoints is geometric with mean mean_runlen.
+        A forward pass computes the evidence of y[0:s] with a segment ending at s and a backward pass computes
+        the evidence of y[s:] given a segment starts at s, so their product gives the exact posterior.
+        Returns -> numpy array cp_probs, where cp_probs[i] is the posterior probability that a new segment
+                   starts at index i (cp_probs[0] is always 0)
+        '''
+        data = np.asarray(data,dtype=float)
+        n = len(data)
+        cp_probs = np.zeros(n)
+        if(n<2):
+            return cp_probs
+
+        # log evidence of y[0:s] with a changepoint right after s-1, and of y[s:] given a changepoint before s
+        log_fwd = self._pruned_recursion(data)
+        log_bwd = self._pruned_recursion(data[::-1])[::-1]
+
+        # both passes carry the hazard of the boundary at s, so one of them is divided out
+        cp_probs[1:] = np.exp(log_fwd[1:n] + log_bwd[1:n] - log_bwd[0] + np.log(self.mean_runlen))
+        return np.clip(cp_probs,0,1)
+
+
+    def _pruned_recursion(self,data):
+        '''
+        One pass of Fearnhead's recursion over data, run in both directions by findoffchangepoint.
+        Keeps sufficient statistics of every candidate segment start still alive, adds one point per step and
+        drops candidates whose posterior weight of still being the current segment falls below prune_thres,
+        keeping at most max_candidates of them.
+        Returns -> numpy array log_ev of length n+1, log_ev[s] being the log evidence of data[0:s] with a
+                   segment boundary right after data[s-1] (log_ev[0] = 0 and log_ev[n] is the total evidence)
+        '''
+        alpha0,beta0,kappa0,mu0 = 0.1,0.01,1.0,0.0
+        log_h = -np.log(self.mean_runlen)
+        log_1mh = np.log1p(-1.0/self.mean_runlen)
+        log_prune = np.log(self.prune_thres)
+
+        n = len(data)
+        log_ev = np.zeros(n+1)
+        # candidate segment starts with their running count, sum and sum of squares
+        starts = np.zeros(0,dtype=int)
+        sum1 = np.zeros(0)
+        sum2 = np.zeros(0)
+
+        for s in range(n):
+            starts = np.append(starts,s)
+            sum1 = np.append(sum1,0.0) + data[s]
+            sum2 = np.append(sum2,0.0) + data[s]**2
+            seg_len = s - starts + 1
+
+            kappa_n = kappa0 + seg_len
+            mu_n = (kappa0*mu0 + sum1)/kappa_n
+            alpha_n = alpha0 + seg_len/2.0
+            beta_n = beta0 + 0.5*(sum2 + kappa0*mu0**2 - kappa_n*mu_n**2)
+            log_ml = (gammaln(alpha_n) - gammaln(alpha0) + alpha0*np.log(beta0) - alpha_n*np.log(beta_n)
+                      + 0.5*(np.log(kappa0) - np.log(kappa_n)) - 0.5*seg_len*np.log(2*np.pi))
+
+            # segment [start,s] either carries on past s or ends at s (or at the end of the series)
+            log_alive = log_ev[starts] + log_ml + (seg_len-1)*log_1mh
+            max_alive = log_alive.max()
+            log_total = max_alive + np.log(np.exp(log_alive - max_alive).sum())
+            if(s==n-1):
+                log_ev[s+1] = log_total
+                break
+            log_ev[s+1] = log_total + log_h
+
+            keep = np.flatnonzero((log_alive - log_total) > log_prune)
+            # in long stationary stretches hardly any start falls below prune_thres, so only the most probable
+            # max_candidates are kept, which bounds the time and memory per datapoint
+            if(len(keep)>self.max_candidates):
+                keep = keep[np.argpartition(log_alive[keep],-self.max_candidates)[-self.max_candidates:]]
+                keep.sort()
+            starts,sum1,sum2 = starts[keep],sum1[keep],sum2[keep]
+
+        return log_ev
+
+
     def findthreshold(self,data):
         
         '''
@@ -94,12 +264,124 @@ class Bayesian_Changept_Detector():
         anom_indexes -> anomaly indexes (list of indices)
         '''
         Nw = self.Nw
-        data = self.data
-        pthres = self.pthres
         
         # This code logic is referred from the github, I couldn't figure out the reason for this.
         # This is the probabilities for each datapoint to be a changepoint
         cp_probs = np.array(R[Nw,Nw:-1][1:-2])
+        anom_indexes = self.findpeakindexes(cp_probs)
+        self.anom_scores = cp_probs[np.asarray(anom_indexes,dtype=int)]
+        
+        if(self.to_plot):
+            self.plotonchangepoints(R=R,anom_indexes=anom_indexes,cp_probs=cp_probs)
+            
+        return anom_indexes
+    
+    
+    def findscoreanomindexes(self,cp_row):
+        '''
+        Function to find the anomaly indexes (changepoint locations) for 'scores_only' and 'truncated' strategies
+        Arguments: 
+        cp_row -> numpy array, changepoint probabilities from findscorechangepoint
+        
+        Returns:
+        anom_indexes -> anomaly indexes (list of indices)
+        '''
+        # same datapoints as R[Nw,Nw:-1][1:-2] in findanomindexes
+        cp_probs = np.array(cp_row[self.Nw:-3])
+        anom_indexes = self.findpeakindexes(cp_probs)
+        self.anom_scores = cp_probs[np.asarray(anom_indexes,dtype=int)]
+        
+        if(self.to_plot):
+            self.plotonchangepoints(R=None,anom_indexes=anom_indexes,cp_probs=cp_probs)
+            
+        return anom_indexes
+    
+    
+    def findsegmentedanomindexes(self,data):
+        '''
+        Function to find the anomaly indexes for 'segmented' strategy. The recursion is carried over chunks of
+        chunk_len datapoints and anomalies are picked within each chunk, so only one chunk of probabilities is
+        kept at a time. Nothing is plotted since the probabilities of the whole series are never kept.
+        Returns:
+        anom_indexes -> anomaly indexes (list of indices)
+        '''
+        Nw = self.Nw
+        n = len(data)
+        state = None
+        anom_indexes = []
+        anom_scores = []
+        
+        for start in range(0,n,self.chunk_len):
+            stop = min(start+self.chunk_len,n)
+            cp_row,state = self.findscorechangepoint(data[start:stop],max_runlen=self.max_runlen,state=state)
+            
+            # keeping only the datapoints which are in R[Nw,Nw:-1][1:-2] of the whole series
+            first,last = max(start,Nw),min(stop,n-3)
+            if(last-first<2):
+                continue
+            cp_probs = cp_row[first-start:last-start]
+            indexes = np.asarray(self.findpeakindexes(cp_probs),dtype=int)
+            anom_indexes.extend(indexes+first-Nw)
+            anom_scores.extend(cp_probs[indexes])
+        
+        self.anom_scores = np.array(anom_scores)
+        return pd.Index(anom_indexes,dtype=int)
+    
+    
+    def finddecimatedanomindexes(self):
+        '''
+        Function to find the anomaly indexes for 'decimated' strategy. The metric is averaged over blocks of
+        decimation datapoints, changepoints are found on the block means by a detector with mean_runlen and Nw
+        scaled down accordingly, and anomaly indexes are mapped back to the first datapoint of each block.
+        Returns:
+        anom_indexes -> anomaly indexes (list of indices)
+        '''
+        k = self.decimation
+        data = self.data
+        ncol = self.data_col_index
+        
+        # only the metric is averaged, assetno is usually a string
+        metric_decimated = data.iloc[:,ncol].groupby(np.arange(len(data))//k).mean()
+        data_decimated = pd.DataFrame({data.columns[0]:self.assetno,self.metric_name:metric_decimated.values},
+                                      index=metric_decimated.index,columns=[data.columns[0],self.metric_name])
+        detector = Bayesian_Changept_Detector(data_decimated,assetno=self.assetno,data_col_index=1,
+                                              pthres=self.pthres,mean_runlen=max(1,int(round(self.mean_runlen/k))),
+                                              Nw=max(1,self.Nw//k),to_plot=False,mode=self.mode,
+                                              prune_thres=self.prune_thres,max_candidates=self.max_candidates,
+                                              strategy='truncated' if self.max_runlen else 'scores_only',
+                                              max_runlen=self.max_runlen)
+        data_decimated,anom_indexes = detector.detect_anomalies()
+        self.anom_scores = detector.anom_scores
+        
+        return pd.Index(np.asarray(anom_indexes,dtype=int)*k)
+    
+    
+    def findoffanomindexes(self,cp_probs):
+        '''
+        Function to find the anomaly indexes (changepoint locations) in offline mode
+        Arguments: 
+        cp_probs -> numpy array, posterior probability of a changepoint at each datapoint from findoffchangepoint
+        
+        Returns:
+        anom_indexes -> anomaly indexes (list of indices)
+        '''
+        # offline posterior peaks are sharp, so neighbouring windows can share the same maximum
+        anom_indexes = self.findpeakindexes(cp_probs).unique()
+        self.anom_scores = cp_probs[np.asarray(anom_indexes,dtype=int)]
+        
+        if(self.to_plot):
+            self.plotonchangepoints(R=None,anom_indexes=anom_indexes,cp_probs=cp_probs)
+            
+        return anom_indexes
+    
+    
+    def findpeakindexes(self,cp_probs):
+        '''
+        Finds the index of the most probable changepoint in each region above the mean probability and
+        keeps those which are above pthres
+        Returns -> anomaly indexes (list of indices)
+        '''
+        pthres = self.pthres
         
         #Finds the list of locations where the left of it is less than mean probability, and right of it is more
         inversion_pts = self.findthreshold(cp_probs)
@@ -112,9 +394,6 @@ class Bayesian_Changept_Detector():
             
         cp_mapped_probs = pd.Series(cp_probs[max_indexes],index=max_indexes)
         anom_indexes = cp_mapped_probs.index[(np.where(cp_mapped_probs.values>pthres)[0])]
-        
-        if(self.to_plot):
-            self.plotonchangepoints(R=R,anom_indexes=anom_indexes,cp_probs=cp_probs)
             
         return anom_indexes
     
@@ -123,8 +402,12 @@ class Bayesian_Changept_Detector():
         '''
         plots the original data and anomaly indexes as vertical line
         and plots run length distribution and probability score for each possible run length
+        Run length distribution is skipped when R is None (offline mode)
         '''
-        fig,(ax1,ax2,ax3) = plt.subplots(3,figsize=[18, 16])
+        if(R is None):
+            fig,(ax1,ax3) = plt.subplots(2,figsize=[18, 11])
+        else:
+            fig,(ax1,ax2,ax3) = plt.subplots(3,figsize=[18, 16])
         ncol = self.data_col_index
         data = self.data
         pthres = self.pthres
@@ -150,14 +433,15 @@ class Bayesian_Changept_Detector():
         Lot of time to compute the graph
         '''
         
-        sparsity = 5  # only plot every fifth data for faster display
-        ax2.pcolor(np.array(range(0, len(R[:,0]), sparsity)), 
-                  np.array(range(0, len(R[:,0]), sparsity)), 
-                  -np.log(R[0:-1:sparsity, 0:-1:sparsity]), 
-                  cmap=cm.Greys, vmin=0, vmax=30,label="Distribution of Run length probability over the Dataset")
-        ax2.set_xlabel(r"Index of Datapoints $\to$")
-        ax2.set_ylabel(r"Possible Run lenghts $\to$")
-        ax2.legend()
+        if(R is not None):
+            sparsity = 5  # only plot every fifth data for faster display
+            ax2.pcolor(np.array(range(0, len(R[:,0]), sparsity)), 
+                      np.array(range(0, len(R[:,0]), sparsity)), 
+                      -np.log(R[0:-1:sparsity, 0:-1:sparsity]), 
+                      cmap=cm.Greys, vmin=0, vmax=30,label="Distribution of Run length probability over the Dataset")
+            ax2.set_xlabel(r"Index of Datapoints $\to$")
+            ax2.set_ylabel(r"Possible Run lenghts $\to$")
+            ax2.legend()
     
         ax3.plot(cp_probs)
 
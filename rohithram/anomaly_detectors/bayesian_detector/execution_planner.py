@@ -0,0 +1,179 @@
+import numpy as np
+import multiprocessing
+
+class Execution_planner():
+
+    '''
+    Class Execution_planner estimates the memory and time of each (asset, metric) job from its no of datapoints
+    and the algorithm parameters, and picks the execution strategy of Bayesian_Changept_Detector and the no of
+    jobs to run in parallel so that the given memory budget is never exceeded.
+    Strategies in the order of preference (most exact first) :
+    full        - whole run length probability matrix, memory grows with square of no of datapoints
+    scores_only - only the changepoint probability of each datapoint, same anomalies as full, but time still
+                  grows with square of no of datapoints, so long series need a time_budget to move on to truncated
+    truncated   - scores_only with run lengths above max_runlen dropped, time is linear in no of datapoints
+    segmented   - truncated with anomalies picked chunk by chunk, memory doesn't depend on no of datapoints
+    decimated   - any of the above on block means of the datapoints, anomalies lose resolution
+    offline     - exact offline segmentation when mode is 'offline', which is already linear in memory
+    Note : time estimates are rough, they only come from the cost per datapoint and per run length below
+    '''
+
+    bytes_per_float = 8
+    # seconds per datapoint and per (datapoint, run length) pair of the online recursion
+    secs_per_step = 3e-4
+    secs_per_cell = 2e-7
+    # seconds per datapoint and per (datapoint, candidate segment start) pair of both passes of the offline recursion
+    secs_per_offline_step = 1.8e-4
+    secs_per_offline_candidate = 1.5e-7
+    # run lengths beyond this many mean_runlen have negligible prior probability, so they can be truncated
+    runlen_span = 10
+
+    def __init__(self,mem_budget_mb=None,time_budget=None,max_workers=1,mean_runlen=100,Nw=10,mode='online',
+                 to_plot=True,max_candidates=200):
+
+        '''
+        Arguments :
+        mem_budget_mb -> (int) memory budget in MB for all jobs running together, None for no limit
+        time_budget -> (float or int) time budget in seconds per job, None for no limit
+        max_workers -> (int) maximum no of jobs to run in parallel, limited to the no of cpus
+        mean_runlen, Nw, mode, to_plot, max_candidates -> same as the algorithm parameters of
+                                                          Bayesian_Changept_Detector
+        '''
+        self.mem_budget = None if mem_budget_mb is None else mem_budget_mb*1024**2
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+        self.mean_runlen = mean_runlen
+        self.Nw = Nw
+        self.mode = mode
+        self.to_plot = to_plot
+        self.max_candidates = max_candidates
+        self.max_runlen = max(self.runlen_span*mean_runlen,Nw+1)
+
+
+    def estimate(self,n,strategy,max_runlen=None,chunk_len=None,decimation=1):
+
+        '''
+        Estimates the memory (bytes) and time (seconds) of a job of n datapoints with the given strategy
+        Returns -> tuple of memory and time
+        '''
+        size = self.bytes_per_float
+
+        if(strategy=='decimated'):
+            n_decimated = int(np.ceil(n/decimation))
+            inner = 'offline' if self.mode=='offline' else ('truncated' if max_runlen else 'scores_only')
+            mem,secs = self.estimate(n_decimated,inner,max_runlen=max_runlen)
+            # block means of the metric and the assetno column
+            return mem+2*size*n_decimated,secs
+
+        if(strategy=='offline'):
+            # forward and backward evidence, reversed copy, float copy and probabilities, and the statistics and
+            # temporaries of the candidate segment starts, which are at most max_candidates
+            candidates = min(n,self.max_candidates)
+            return (5*size*n + 12*size*candidates,
+                    n*(self.secs_per_offline_step + candidates*self.secs_per_offline_candidate))
+
+        if(strategy=='full'):
+            # run length matrix, and the run length distribution with the four parameters of the model
+            return size*(n+1)**2 + 8*size*n, n*self.secs_per_step + n*n/2*self.secs_per_cell
+
+        if(strategy=='scores_only'):
+            # run length distribution with the four parameters of the model and a probability per datapoint
+            return 10*size*n, n*self.secs_per_step + n*n/2*self.secs_per_cell
+
+        runlens = min(n,max_runlen)
+        secs = n*self.secs_per_step + n*runlens*self.secs_per_cell
+        if(strategy=='truncated'):
+            return 8*size*runlens + 2*size*n,secs
+
+        # segmented
+        return 8*size*runlens + 2*size*min(n,chunk_len),secs
+
+
+    def plan_job(self,n,mem_budget=None):
+
+        '''
+        Picks the most exact strategy for a job of n datapoints which fits into mem_budget (bytes) and
+        time_budget. When nothing fits, the most decimated one is returned with 'fits' as False.
+        Returns -> dictionary of strategy, its detector arguments, estimated memory and time
+        '''
+        max_runlen = self.max_runlen
+        if(self.mode=='offline'):
+            candidates = [{'strategy':'offline'}]
+        else:
+            candidates = [{'strategy':'full'},{'strategy':'scores_only'}]
+            # truncation only changes anything when run lengths can go beyond max_runlen
+            if(n>max_runlen):
+                candidates.append({'strategy':'truncated','max_runlen':max_runlen})
+                if(mem_budget is not None):
+                    # largest chunk which fits, chunks shorter than max_runlen would split most of the anomalies
+                    chunk_len = int((mem_budget - 8*self.bytes_per_float*max_runlen)/(2*self.bytes_per_float))
+                    if(chunk_len>=max_runlen):
+                        candidates.append({'strategy':'segmented','max_runlen':max_runlen,'chunk_len':chunk_len})
+
+        # halving the no of datapoints until the block means are too few to wait Nw samples on
+        decimation = 2
+        while(n/decimation>=4*(self.Nw+4)):
+            runlens = max(int(np.ceil(max_runlen/decimation)),self.Nw//decimation+1)
+            if(self.mode=='offline' or n/decimation<=runlens):
+                runlens = None
+            candidates.append({'strategy':'decimated','decimation':decimation,'max_runlen':runlens})
+            decimation*=2
+
+        for candidate in candidates:
+            plan = dict({'max_runlen':None,'chunk_len':None,'decimation':1},**candidate)
+            plan['mem'],plan['time'] = self.estimate(n,plan['strategy'],max_runlen=plan['max_runlen'],
+                                                     chunk_len=plan['chunk_len'],decimation=plan['decimation'])
+            plan['fits'] = ((mem_budget is None or plan['mem']<=mem_budget) and
+                            (self.time_budget is None or plan['time']<=self.time_budget))
+            if(plan['fits']):
+                break
+
+        return plan
+
+
+    def plan(self,lengths):
+
+        '''
+        Plans all the jobs given their no of datapoints. Each of the jobs running in parallel gets an equal share
+        of the memory budget, so the no of workers is the largest one which leaves every job with the same strategy
+        and detector arguments (max_runlen, chunk_len, decimation) as running them one at a time. Plots are shown from the main process, so no parallelism
+        when to_plot is True.
+        Returns -> list of plans per job and no of workers
+        '''
+        plans = [self.plan_job(n,self.mem_budget) for n in lengths]
+        plan_keys = [self.plan_key(plan) for plan in plans]
+
+        max_workers = 1 if self.to_plot else min(self.max_workers,multiprocessing.cpu_count(),len(lengths))
+        for n_workers in range(max_workers,1,-1):
+            mem_budget = None if self.mem_budget is None else self.mem_budget/n_workers
+            plans_parallel = [self.plan_job(n,mem_budget) for n in lengths]
+            if([self.plan_key(plan) for plan in plans_parallel]==plan_keys):
+                return plans_parallel,n_workers
+
+        return plans,1
+
+
+    def plan_key(self,plan):
+
+        '''
+        Returns -> the part of a plan which changes the anomalies detected, i.e. everything but the estimates
+        '''
+        return tuple(plan[key] for key in ['strategy','max_runlen','chunk_len','decimation','fits'])
+
+
+    def report(self,job_names,plans,n_workers):
+
+        '''
+        Prints the chosen plan of each job along with its estimated memory and time
+        '''
+        print("\nExecution plan ({} job(s) in parallel, memory budget : {}, time budget per job : {}) :".format(
+            n_workers,'None' if self.mem_budget is None else '{:.0f} MB'.format(self.mem_budget/1024**2),
+            'None' if self.time_budget is None else '{} s'.format(self.time_budget)))
+
+        for job_name,plan in zip(job_names,plans):
+            params = ', '.join('{} = {}'.format(key,plan[key]) for key in ['max_runlen','chunk_len','decimation']
+                               if plan[key] not in [None,1])
+            print("{} : {}{}, estimated memory = {:.1f} MB, estimated time = {:.1f} s{}".format(
+                job_name,plan['strategy'],' ({})'.format(params) if params else '',plan['mem']/1024**2,
+                plan['time'],'' if plan['fits'] else ' (exceeds the budget)'))
+        print()
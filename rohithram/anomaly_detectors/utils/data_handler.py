@@ -3,7 +3,6 @@
 import numpy as np
 import pandas as pd
 import json
-from pandas.io.json import json_normalize
 
 import datetime as dt
 # error code is python file which contains dictionary of mapped error codes and messages for different errors
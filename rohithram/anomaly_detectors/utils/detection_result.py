@@ -0,0 +1,32 @@
+import numpy as np
+
+class Detection_result():
+    
+    '''
+    Compact record of the anomalies found by a detector for one asset, which is all make_ack_json needs.
+    It keeps only the anomaly timestamps and scores as arrays so the detector, its dataframe and posterior
+    matrices need not be kept alive until the acknowledgement json is made.
+    Arguments :
+    assetno -> assetno of the dataset
+    metric_name -> name of the metric (list of metric names for multivariate detectors)
+    anom_timestamps -> epoch timestamps of the anomalies, stored as int64 array
+    anom_scores -> score of each anomaly (changepoint probability for bayesian changepoint detector)
+    algo_code -> algorithm code written in each datapoint of the json
+    algo_type -> 'univariate' or 'multivariate'
+    n_points -> no of datapoints the detector ran on, 0 means the data was empty
+    error -> error message when detection failed for this metric, it is then written as no anomalies
+    '''
+    
+    __slots__ = ['assetno','metric_name','anom_timestamps','anom_scores','algo_code','algo_type','n_points','error']
+    
+    def __init__(self,assetno,metric_name,anom_timestamps,anom_scores,algo_code,algo_type='univariate',n_points=0,
+                 error=None):
+        
+        self.assetno = assetno
+        self.metric_name = metric_name
+        self.anom_timestamps = np.asarray(anom_timestamps,dtype=np.int64)
+        self.anom_scores = np.asarray(anom_scores,dtype=float)
+        self.algo_code = algo_code
+        self.algo_type = algo_type
+        self.n_points = n_points
+        self.error = error
@@ -4,17 +4,18 @@ import pandas as pd
 import numpy as np
 from anomaly_detectors.utils.error_codes import error_codes
 
-def make_ack_json(anomaly_detectors):
+def make_ack_json(detection_results):
     
     '''
     Function to make acknowledgement output json.
-    Arguments : List of anomaly detector objects which has all the info such as anomaly indexes per metric per asset
+    Arguments : List of Detection_result records (detection_result.py) which has all the info such as anomaly timestamps
+                per metric per asset
     Returns   : dictionary of acknowledgement json
     Logic     : The function makes o/p json for two cases i.e univariate and multivariate separately.
-                If its univariate , each anomaly detector object has only anomaly info of only one metric in an asset
-                so to make json o/p we combine all the anomaly detector objects per asset and write them together under an
-                asset. We split the total list of anomaly detectors into groups by assetno, and then loop over them.
-                Whereas for multivariate ,each anomaly detector consists info about all metrics per asset, so we just loop 
+                If its univariate , each record has only anomaly info of only one metric in an asset
+                so to make json o/p we combine all the records per asset and write them together under an
+                asset. We split the total list of records into groups by assetno, and then loop over them.
+                Whereas for multivariate ,each record consists info about all metrics per asset, so we just loop 
                 over the list and make o/p json
     Note      : The function also added new feature called anom_counts under each asset json , to indicate the no of anomalies
                 detected for each metric in an asset, so this can be utilised to check for no anomaly case
@@ -33,10 +34,10 @@ def make_ack_json(anomaly_detectors):
     zero_anomalies = 0
     total_anom_detectors = 0
     error_codes1= error_codes()
-    if(anomaly_detectors[0].algo_type=='univariate'):
+    if(detection_results[0].algo_type=='univariate'):
         
-        no_assets = pd.unique([anomaly_detector.assetno for anomaly_detector in anomaly_detectors]).size 
-        anomaly_detectors_per_asset = np.split(np.array(anomaly_detectors),no_assets)
+        no_assets = pd.unique(np.array([detection_result.assetno for detection_result in detection_results])).size 
+        detection_results_per_asset = np.split(np.array(detection_results),no_assets)
         
         
         for i in range(no_assets):
@@ -45,22 +46,20 @@ def make_ack_json(anomaly_detectors):
             
             no_zero_anoms = 0
             
-            for anomaly_detector in anomaly_detectors_per_asset[i]:
+            for detection_result in detection_results_per_asset[i]:
 
-                data = anomaly_detector.data
-                anom_indexes = anomaly_detector.anom_indexes
+                anom_timestamps = detection_result.anom_timestamps
 
-                if(len(data[anomaly_detector.metric_name])!=0):
+                if(detection_result.n_points!=0):
                     total_anom_detectors+=1
-                    if(len(anom_indexes)!=0):
-                        anom_per_asset1['asset'] = anomaly_detector.assetno
+                    if(len(anom_timestamps)!=0):
+                        anom_per_asset1['asset'] = detection_result.assetno
                         anom_per_metric1 = anom_per_metric()
-                        anom_per_metric1['name'] = anomaly_detector.metric_name
-                        anom_timestamps = (data.index[anom_indexes].values)
-                        anom_timestamps = [np.asscalar(t) for t in anom_timestamps]
+                        anom_per_metric1['name'] = detection_result.metric_name
+                        anom_timestamps = anom_timestamps.tolist()
                                                 
                         anom_per_metric1['datapoints'] = [dict(list(zip(Datapoint_keys,[t,t,[t],
-                                                                                        anomaly_detector.algo_code])))
+                                                                                        detection_result.algo_code])))
                                                       for t in anom_timestamps] 
 
                         anom_per_asset1['anomalies'].append(anom_per_metric1)
@@ -75,42 +74,38 @@ def make_ack_json(anomaly_detectors):
                     return ack_json1
                     
                 
-            if(no_zero_anoms!=len(anomaly_detectors_per_asset[i])):
+            if(no_zero_anoms!=len(detection_results_per_asset[i])):
                 ack_json1['body'].append(anom_per_asset1)
                                 
                     
     else:
         
-        for anomaly_detector in anomaly_detectors:
+        for detection_result in detection_results:
 
-            data = anomaly_detector.data
-            anom_indexes = anomaly_detector.anom_indexes
-            if(len(data)!=0):
+            anom_timestamps = detection_result.anom_timestamps
+            if(detection_result.n_points!=0):
                 total_anom_detectors+=1
-                if(len(anom_indexes)==0):
+                if(len(anom_timestamps)==0):
                     overall_zero_anoms +=1
             
-            if(len(data)!=0):
+            if(detection_result.n_points!=0):
                 total_anom_detectors+=1
-                if(len(anom_indexes)==0):
+                if(len(anom_timestamps)==0):
                     zero_anomalies +=1
                 else:
                     ack_json1['header'] = error_codes1['success']
                     anom_per_asset1 = anom_per_asset()
-                    anom_per_asset1['asset'] = anomaly_detector.assetno
+                    anom_per_asset1['asset'] = detection_result.assetno
 
-                    metric_names = anomaly_detector.metric_name
+                    metric_names = detection_result.metric_name
 
                     for metric_name in metric_names:
 
                         anom_per_metric1 = anom_per_metric()
                         anom_per_metric1['name'] = metric_name
-                        anom_timestamps = (data.index[anom_indexes].values)
-                        anom_timestamps = [np.asscalar(t) for t in anom_timestamps]
-                                                
                         anom_per_metric1['datapoints'] = [dict(list(zip(Datapoint_keys,[t,t,[t],
-                                                                                        anomaly_detector.algo_code])))
-                                                      for t in anom_timestamps] 
+                                                                                        detection_result.algo_code])))
+                                                      for t in anom_timestamps.tolist()] 
                         anom_per_asset1['anomalies'].append(anom_per_metric1)
 
                     ack_json1['body'].append(anom_per_asset1)
@@ -19,7 +19,8 @@ class Type_checker():
         '''
         Function to check the parameters
         and returns the corresponding error message when mismatch encountered
-        It also checks for probability threshold between 0 and 1
+        It also checks for probability threshold between 0 and 1, mode being 'online' or 'offline' and
+        memory budget, time budget and no of workers being positive
         '''
         error_codes1 = error_codes()
         kwargs = self.kwargs
@@ -36,6 +37,24 @@ class Type_checker():
                             error_codes1['param']['message']='probability must be between 0 and 1 and it must be of type int or float'
                             return error_codes1['param']
                         
+                if(key in ['mem_budget_mb','time_budget','max_workers'] and kwargs[key]!=None):
+                    if(type(kwargs[key])==int or (key=='time_budget' and type(kwargs[key])==float)):
+                        if(kwargs[key]>0):
+                            continue
+                        else:
+                            error_codes1['param']['data']['argument']=key
+                            error_codes1['param']['data']['value']=kwargs[key]
+                            error_codes1['param']['message']='{} must be greater than 0 and it must be of type {}'.format(
+                                key,'int or float' if key=='time_budget' else 'int')
+                            return error_codes1['param']
+                        
+                if(key=='mode'):
+                    if(kwargs[key] not in ['online','offline']):
+                        error_codes1['param']['data']['argument']='mode'
+                        error_codes1['param']['data']['value']=kwargs['mode']
+                        error_codes1['param']['message']="mode must be either 'online' or 'offline'"
+                        return error_codes1['param']
+                        
             except:
                 pass
             
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+
+from anomaly_detectors.bayesian_detector import bayeschangept_wrapper
+from anomaly_detectors.bayesian_detector import execution_planner
+from anomaly_detectors.bayesian_detector.bayesian_changept_detector import Bayesian_Changept_Detector
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    '''
+    reader csv of assets A1 and A2 with metrics 'good' and 'bad', each having mean shifts every 150 datapoints
+    '''
+    rng = np.random.RandomState(0)
+    frames = []
+    for assetno in ['A1','A2']:
+        values = np.concatenate([rng.normal(mean,1,150) for mean in [0,5,-3]])
+        frames.append(pd.DataFrame({'timestamp':np.arange(len(values))*60000,'good':values,
+                                    'bad':values[::-1],'assetno':assetno}))
+    filepath = tmp_path/'reader.csv'
+    pd.concat(frames).to_csv(filepath,index=False)
+    return str(filepath)
+
+
+@pytest.fixture
+def failing_bad_metric(monkeypatch):
+    detect_anomalies = Bayesian_Changept_Detector.detect_anomalies
+
+    def detect_anomalies_or_fail(self):
+        if(self.metric_name=='bad'):
+            raise ValueError('bad series')
+        return detect_anomalies(self)
+
+    monkeypatch.setattr(Bayesian_Changept_Detector,'detect_anomalies',detect_anomalies_or_fail)
+
+
+@pytest.mark.parametrize('max_workers',[1,2])
+def test_failing_series_keeps_other_results(csv_file,failing_bad_metric,monkeypatch,max_workers):
+    monkeypatch.setattr(execution_planner.multiprocessing,'cpu_count',lambda:2)
+    ack_json = json.loads(bayeschangept_wrapper.main(csv_file,to_plot=False,max_workers=max_workers))
+
+    assert ack_json['header']=={"code":"200","status":"OK"}
+    assert [asset['asset'] for asset in ack_json['body']]==['A1','A2']
+    for asset in ack_json['body']:
+        assert [metric['name'] for metric in asset['anomalies']]==['good']
+        assert len(asset['anomalies'][0]['datapoints'])>0
+
+
+def test_invalid_budget(csv_file):
+    res = json.loads(bayeschangept_wrapper.main(csv_file,to_plot=False,mem_budget_mb=0))
+
+    assert res['code']=='400'
+    assert res['data']['argument']=='mem_budget_mb'
@@ -0,0 +1,93 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+from scipy.special import gammaln
+
+from anomaly_detectors.bayesian_detector.bayesian_changept_detector import Bayesian_Changept_Detector
+
+
+def make_data(values,assetno='A1'):
+    '''
+    dataframe in the reader's format, assetno being the first column and timestamps the index
+    '''
+    return pd.DataFrame({'assetno':assetno,'metric':values},index=np.arange(len(values))*1000)
+
+
+def log_marginal_likelihood(x):
+    '''
+    log evidence of one segment under the Normal-Gamma model used by the detector
+    '''
+    alpha0,beta0,kappa0,mu0 = 0.1,0.01,1.0,0.0
+    n = len(x)
+    kappa_n = kappa0 + n
+    mu_n = (kappa0*mu0 + x.sum())/kappa_n
+    alpha_n = alpha0 + n/2.0
+    beta_n = beta0 + 0.5*((x**2).sum() + kappa0*mu0**2 - kappa_n*mu_n**2)
+    return (gammaln(alpha_n) - gammaln(alpha0) + alpha0*np.log(beta0) - alpha_n*np.log(beta_n)
+            + 0.5*(np.log(kappa0) - np.log(kappa_n)) - 0.5*n*np.log(2*np.pi))
+
+
+def enumerate_cp_probs(data,mean_runlen):
+    '''
+    posterior changepoint probabilities by summing over every segmentation of data
+    '''
+    n = len(data)
+    h = 1.0/mean_runlen
+    total = 0.0
+    cp_probs = np.zeros(n)
+    for boundaries in itertools.product([False,True],repeat=n-1):
+        starts = [0] + [i+1 for i,boundary in enumerate(boundaries) if boundary] + [n]
+        weight = 1.0
+        for j in range(len(starts)-1):
+            seg_len = starts[j+1]-starts[j]
+            weight *= np.exp(log_marginal_likelihood(data[starts[j]:starts[j+1]]))*(1-h)**(seg_len-1)
+            if(j<len(starts)-2):
+                weight *= h
+        total += weight
+        cp_probs[starts[1:-1]] += weight
+    return cp_probs/total
+
+
+def test_offline_cp_probs_match_enumeration():
+    rng = np.random.RandomState(0)
+    data = np.r_[rng.normal(0,1,5),rng.normal(3,1,5)]
+    detector = Bayesian_Changept_Detector(make_data(data),assetno='A1',mean_runlen=5,to_plot=False,
+                                          mode='offline',prune_thres=1e-300)
+
+    np.testing.assert_allclose(detector.findoffchangepoint(data),enumerate_cp_probs(data,5),atol=1e-10)
+
+
+def test_offline_detects_mean_shifts():
+    rng = np.random.RandomState(1)
+    data = np.concatenate([rng.normal(mean,1,300) for mean in [0,4,-2,3]])
+    detector = Bayesian_Changept_Detector(make_data(data),assetno='A1',to_plot=False,mode='offline')
+
+    data,anom_indexes = detector.detect_anomalies()
+    assert list(anom_indexes)==[300,600,900]
+
+
+def test_decimated_with_string_assetno():
+    rng = np.random.RandomState(2)
+    data = np.concatenate([rng.normal(mean,1,300) for mean in [0,4,-2]])
+    detector = Bayesian_Changept_Detector(make_data(data,assetno='A1'),assetno='A1',to_plot=False,
+                                          strategy='decimated',decimation=4,max_runlen=250)
+
+    result = detector.detect()
+    assert result.assetno=='A1'
+    assert len(result.anom_timestamps)==len(result.anom_scores)
+    assert all(abs(result.anom_timestamps//1000 - cp).min()<=8 for cp in [300,600])
+
+
+def test_scores_only_matches_full():
+    rng = np.random.RandomState(3)
+    data = np.concatenate([rng.normal(mean,1,150) for mean in [0,4,-2,3,1,5]])
+    anom_indexes = {}
+    for strategy in ['full','scores_only']:
+        detector = Bayesian_Changept_Detector(make_data(data),assetno='A1',to_plot=False,strategy=strategy)
+        data_detected,anom_indexes[strategy] = detector.detect_anomalies()
+
+    assert len(anom_indexes['full'])>0
+    assert list(anom_indexes['scores_only'])==list(anom_indexes['full'])
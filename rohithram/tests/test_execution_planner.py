@@ -0,0 +1,76 @@
+from anomaly_detectors.bayesian_detector import execution_planner
+from anomaly_detectors.bayesian_detector.execution_planner import Execution_planner
+
+
+def strategy_for(n,**kwargs):
+    planner = Execution_planner(to_plot=False,**kwargs)
+    plans,n_workers = planner.plan([n])
+    return plans[0]
+
+
+def test_no_budget_keeps_full_posterior():
+    plan = strategy_for(20000)
+    assert plan['strategy']=='full'
+    assert plan['fits']
+
+
+def test_strategy_order_as_memory_budget_shrinks():
+    # full posterior of 5000 datapoints needs about 190 MB
+    assert strategy_for(5000,mem_budget_mb=500)['strategy']=='full'
+    assert strategy_for(5000,mem_budget_mb=100)['strategy']=='scores_only'
+    assert strategy_for(20000,mem_budget_mb=100,time_budget=20)['strategy']=='truncated'
+
+    plan = strategy_for(200000,mem_budget_mb=1)
+    assert plan['strategy']=='segmented'
+    assert plan['mem']<=1024**2
+
+    plan = strategy_for(200000,mem_budget_mb=1,time_budget=30)
+    assert plan['strategy']=='decimated'
+    assert plan['fits']
+
+
+def test_falls_back_to_most_decimated_when_nothing_fits():
+    plan = strategy_for(10**6,mem_budget_mb=1,time_budget=1e-3)
+    assert plan['strategy']=='decimated'
+    assert not plan['fits']
+    assert 10**6/plan['decimation']/2<4*(10+4)
+
+
+def test_offline_mode():
+    assert strategy_for(20000,mode='offline')['strategy']=='offline'
+    plan = strategy_for(20000,mode='offline',time_budget=1)
+    assert plan['strategy']=='decimated'
+    assert plan['max_runlen'] is None
+
+
+def test_parallelism_never_degrades_strategies(monkeypatch):
+    monkeypatch.setattr(execution_planner.multiprocessing,'cpu_count',lambda:4)
+
+    # two full posteriors of about 190 MB each don't fit 300 MB together
+    planner = Execution_planner(mem_budget_mb=300,max_workers=4,to_plot=False)
+    plans,n_workers = planner.plan([5000,5000])
+    assert [plan['strategy'] for plan in plans]==['full','full']
+    assert n_workers==1
+
+    planner = Execution_planner(mem_budget_mb=500,max_workers=4,to_plot=False)
+    plans,n_workers = planner.plan([5000,5000,800])
+    assert [plan['strategy'] for plan in plans]==['full','full','full']
+    assert n_workers==2
+
+    planner = Execution_planner(mem_budget_mb=500,max_workers=4,to_plot=True)
+    plans,n_workers = planner.plan([800,800])
+    assert n_workers==1
+
+
+def test_parallelism_keeps_decimation_and_chunk_len(monkeypatch):
+    monkeypatch.setattr(execution_planner.multiprocessing,'cpu_count',lambda:8)
+
+    for kwargs in [dict(mem_budget_mb=1,time_budget=30),dict(mem_budget_mb=1)]:
+        serial_plan = strategy_for(200000,**kwargs)
+        planner = Execution_planner(max_workers=8,to_plot=False,**kwargs)
+        plans,n_workers = planner.plan([200000,200000])
+        assert n_workers==1
+        assert [planner.plan_key(plan) for plan in plans]==[planner.plan_key(serial_plan)]*2
+
+    assert strategy_for(200000,mem_budget_mb=1,time_budget=30)['decimation']==8
+    assert strategy_for(200000,mem_budget_mb=1)['strategy']=='segmented'
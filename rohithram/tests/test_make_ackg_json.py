@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+
+from anomaly_detectors.utils.detection_result import Detection_result
+from anomaly_detectors.utils.make_ackg_json import make_ack_json
+
+
+def make_results(anom_timestamps_a1):
+    '''
+    records of two metrics for each of assets A1 and A2, only A1's first metric having anomalies
+    '''
+    return [Detection_result('A1','m1',anom_timestamps_a1,np.full(len(anom_timestamps_a1),0.9),'bcp',n_points=100),
+            Detection_result('A1','m2',[],[],'bcp',n_points=100),
+            Detection_result('A2','m1',[],[],'bcp',n_points=100),
+            Detection_result('A2','m2',[],[],'bcp',n_points=100)]
+
+
+def test_anomalies_of_assets():
+    timestamps = np.array([1500000000000,1500000060000],dtype=np.int64)
+    ack_json = make_ack_json(make_results(timestamps))
+
+    assert ack_json['header']=={"code":"200","status":"OK"}
+    assert ack_json['body']==[{'asset':'A1','anomalies':[{'name':'m1','datapoints':[
+        {'from_timestamp':t,'to_timestamp':t,'anomaly_timestamp':[t],'anomaly_code':'bcp'} for t in timestamps.tolist()]}]}]
+
+    datapoint = ack_json['body'][0]['anomalies'][0]['datapoints'][0]
+    assert type(datapoint['anomaly_timestamp'][0]) is int
+    assert json.loads(json.dumps(ack_json))==ack_json
+
+
+def test_no_anomalies():
+    ack_json = make_ack_json(make_results([]))
+
+    assert ack_json['header']['message']=='No Anomalies detected'
+    assert ack_json['body']==[]
+
+
+def test_empty_data():
+    results = make_results([])
+    results[0].n_points = 0
+
+    assert make_ack_json(results)['header']['code']=='204'
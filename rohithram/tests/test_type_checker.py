@@ -0,0 +1,33 @@
+import pytest
+
+from anomaly_detectors.utils import type_checker
+from anomaly_detectors.bayesian_detector.bayeschangept_wrapper import planner_params_type
+
+
+def check(**kwargs):
+    planner_kwargs = dict({'mem_budget_mb':None,'time_budget':None,'max_workers':1},**kwargs)
+    return type_checker.Type_checker(kwargs=planner_kwargs,ideal_args_type=planner_params_type).params_checker()
+
+
+@pytest.mark.parametrize('kwargs',[{},{'mem_budget_mb':500},{'time_budget':0.5},{'time_budget':30},
+                                   {'max_workers':4}])
+def test_valid_planner_params(kwargs):
+    assert check(**kwargs) is None
+
+
+@pytest.mark.parametrize('kwargs',[{'mem_budget_mb':0},{'mem_budget_mb':-1},{'time_budget':0},
+                                   {'time_budget':-0.5},{'max_workers':0},{'max_workers':-2}])
+def test_non_positive_planner_params(kwargs):
+    res = check(**kwargs)
+    argument,value = list(kwargs.items())[0]
+    assert res['code']=='400'
+    assert res['data']=={'argument':argument,'value':value}
+    assert res['message'].startswith('{} must be greater than 0'.format(argument))
+
+
+@pytest.mark.parametrize('kwargs',[{'mem_budget_mb':1.5},{'mem_budget_mb':'5'},{'time_budget':'1'},
+                                   {'max_workers':2.0}])
+def test_wrong_type_planner_params(kwargs):
+    res = check(**kwargs)
+    assert res['code']=='400'
+    assert res['message'].startswith('should be of type')